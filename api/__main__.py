@@ -0,0 +1,29 @@
+"""
+API server entrypoint: python -m api
+
+Kept out of api/app.py so uvicorn imports the app module exactly once;
+running app.py as __main__ would register its Prometheus metrics twice.
+"""
+
+import os
+
+import uvicorn
+
+if __name__ == "__main__":
+    if os.getenv("ENVIRONMENT", "development") == "production":
+        # One process per core sidesteps the GIL. Equivalent under gunicorn:
+        #   gunicorn -k uvicorn.workers.UvicornWorker -w N api.app:app
+        uvicorn.run(
+            "api.app:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=int(os.getenv("WORKERS", os.cpu_count())),
+            loop="uvloop",
+            http="httptools",
+            log_level="warning",
+            access_log=False,
+        )
+    else:
+        uvicorn.run(
+            "api.app:app", host="0.0.0.0", port=8000, reload=True, log_level="info"
+        )
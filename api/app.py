@@ -2,17 +2,24 @@
 FastAPI Application for Heart Disease Prediction
 """
 
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from datetime import datetime
 from pathlib import Path
 
+import anyio
 import joblib
-import pandas as pd
-import uvicorn
+import numpy as np
+from cachetools import LRUCache
 from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import ORJSONResponse
 from prometheus_client import (CONTENT_TYPE_LATEST, Counter, Gauge, Histogram,
                                generate_latest)
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+from sklearn.linear_model import LogisticRegression
+
+from src.data.preprocessing import HeartDiseasePreprocessor
 
 # Configure logging
 logging.basicConfig(
@@ -29,6 +36,9 @@ PREDICTION_COUNT = Counter(
 PREDICTION_LATENCY = Histogram(
     "prediction_latency_seconds", "Time spent processing prediction"
 )
+CACHE_HIT_COUNT = Counter(
+    "cache_hit_total", "Number of predictions served from the prediction cache"
+)
 
 # metrics for Model Outputs
 PREDICTION_RESULTS = Counter(
@@ -36,6 +46,14 @@ PREDICTION_RESULTS = Counter(
     "Count of predictions by risk level",
     ["risk_level", "prediction_class"],
 )
+# Pre-bind every (risk_level, prediction_class) child to skip labels() per request
+PREDICTION_RESULT_CHILDREN = {
+    (risk_level, prediction_class): PREDICTION_RESULTS.labels(
+        risk_level=risk_level, prediction_class=prediction_class
+    )
+    for risk_level in ("Low", "Medium", "High")
+    for prediction_class in ("0", "1")
+}
 
 # metrics for Feature Distributions (Gauges are best for current values)
 FEATURE_AGE = Gauge("feature_age_years", "Age of the latest applicant")
@@ -43,20 +61,33 @@ FEATURE_CHOL = Gauge(
     "feature_cholesterol_mgdl", "Cholesterol level of the latest applicant"
 )
 
+
+@asynccontextmanager
+async def lifespan(app):
+    """Warm the inference path before the first request is served"""
+    await anyio.to_thread.run_sync(warmup)
+    yield
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Heart Disease Prediction API",
     description="API for predicting heart disease risk",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # Load model and preprocessor at startup
 MODEL_PATH = Path("models/best_model.pkl")
+ONNX_MODEL_PATH = Path("models/best_model.onnx")
 PREPROCESSOR_PATH = Path("models/preprocessor.pkl")
 
 try:
-    model = joblib.load(MODEL_PATH)
-    preprocessor = joblib.load(PREPROCESSOR_PATH)
+    # Memory-map the numpy arrays inside the pickles instead of copying them,
+    # so uvicorn workers share read-only pages for scaler stats and trees
+    model = joblib.load(MODEL_PATH, mmap_mode="r")
+    preprocessor = HeartDiseasePreprocessor.load(PREPROCESSOR_PATH, mmap_mode="r")
     logger.info("✓ Model and preprocessor loaded successfully")
 except Exception as e:
     logger.error(f"✗ Error loading model: {e}")
@@ -64,6 +95,161 @@ except Exception as e:
     preprocessor = None
 
 
+def _load_onnx_session(path):
+    """Open an ONNX Runtime session for path, or None if it can't be used"""
+    try:
+        import onnxruntime as ort
+
+        session_options = ort.SessionOptions()
+        session_options.intra_op_num_threads = 1
+        session = ort.InferenceSession(
+            str(path),
+            sess_options=session_options,
+            providers=["CPUExecutionProvider"],
+        )
+        logger.info("✓ ONNX model loaded successfully")
+        return session
+    except Exception as e:
+        logger.warning(f"ONNX model not used, falling back to sklearn: {e}")
+        return None
+
+
+# Pick the inference backend. numba and onnxruntime are slow to import, so
+# they are only imported when the loaded model actually uses them.
+lr_weights = None
+onnx_session = None
+if isinstance(model, LogisticRegression):
+    # Logistic regression is a dot product plus sigmoid, so score it with a
+    # compiled kernel: the AOT build from scripts/build_kernels.py if present,
+    # otherwise JIT-compiled and warmed here so the first request doesn't compile.
+    try:
+        from api.heart_kernels import score_lr as _score_lr
+    except ImportError:
+        from numba import njit
+
+        from api.kernels import score_lr
+
+        _score_lr = njit(cache=True, fastmath=True)(score_lr)
+    lr_weights = (
+        np.array(model.coef_[0], dtype=np.float64),
+        float(model.intercept_[0]),
+    )
+    _score_lr(np.zeros((1, lr_weights[0].shape[0])), *lr_weights)
+elif model is not None and ONNX_MODEL_PATH.exists():
+    # Prefer the ONNX export for other models; fall back to the sklearn model
+    onnx_session = _load_onnx_session(ONNX_MODEL_PATH)
+
+# Column order of the raw inputs the preprocessor was fitted on
+if preprocessor is not None:
+    FEATURE_ORDER = list(preprocessor.pipeline.feature_names_in_)
+else:
+    FEATURE_ORDER = []
+
+# Cache of (prediction, probability) keyed on the validated input fields.
+# Only touched from the event loop, so no lock is needed.
+PREDICTION_CACHE_SIZE = 10_000
+prediction_cache = LRUCache(maxsize=PREDICTION_CACHE_SIZE)
+
+# Risk bands: Low below 0.3, Medium below 0.7, High otherwise
+RISK_THRESHOLDS = np.array([0.3, 0.7])
+RISK_LEVELS = np.array(["Low", "Medium", "High"])
+
+
+def get_risk_level(probability):
+    """Map probabilities (scalar or ndarray) to risk levels"""
+    return RISK_LEVELS[np.searchsorted(RISK_THRESHOLDS, probability, side="right")]
+
+
+# Micro-batching settings
+BATCH_MAX_SIZE = 32
+BATCH_MAX_WAIT_SECONDS = 0.005
+
+
+def _infer(rows):
+    """Run preprocessing and inference for a batch of rows in FEATURE_ORDER"""
+    # transform_fast builds its own float64 array from the rows, so nothing
+    # here is shared between batches running on different event loops
+    X = preprocessor.transform_fast(rows)
+
+    if lr_weights is not None:
+        probabilities = _score_lr(X, *lr_weights)
+    elif onnx_session is not None:
+        probabilities = onnx_session.run(None, {"X": X.astype(np.float32)})[1][:, 1]
+    else:
+        probabilities = model.predict_proba(X)[:, 1]
+
+    # Derive the class from the probability instead of a second predict call
+    predictions = (probabilities >= 0.5).astype(int)
+
+    return list(zip(predictions, probabilities))
+
+
+def warmup():
+    """Run one dummy inference so first-request costs are paid up front
+
+    Touches the memory-mapped artifacts and the selected backend (compiled
+    kernel, ONNX session or sklearn model). A no-op when nothing is loaded.
+    """
+    if model is None or preprocessor is None:
+        return
+    _infer([(0.0,) * len(FEATURE_ORDER)])
+
+
+class PredictionBatcher:
+    """Coalesces concurrent prediction requests into a single model call"""
+
+    def __init__(self, max_batch_size=BATCH_MAX_SIZE, max_wait=BATCH_MAX_WAIT_SECONDS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._loop = None
+        self._queue = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        """Start the background worker on the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            # A worker left on a previous loop would wait forever on its queue
+            if self._worker is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._worker.cancel)
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def submit(self, row):
+        """Queue a single input row and wait for its (prediction, probability)"""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def _run(self):
+        """Drain the queue in batches and fan results back to the callers"""
+        while True:
+            batch = [await self._queue.get()]
+
+            # Give concurrent requests a short window to join the batch
+            await asyncio.sleep(self.max_wait)
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            rows = [row for row, _ in batch]
+            try:
+                results = await anyio.to_thread.run_sync(_infer, rows)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+batcher = PredictionBatcher()
+
+
 # Request schema
 class HeartDiseaseInput(BaseModel):
     age: int = Field(..., ge=0, le=120, description="Age in years")
@@ -80,8 +266,10 @@ class HeartDiseaseInput(BaseModel):
     ca: int = Field(..., ge=0, le=4, description="Number of major vessels")
     thal: int = Field(..., ge=0, le=3, description="Thalassemia")
 
-    model_config = {
-        "json_schema_extra": {
+    model_config = ConfigDict(
+        extra="forbid",
+        frozen=True,
+        json_schema_extra={
             "example": {
                 "age": 63,
                 "sex": 1,
@@ -97,8 +285,8 @@ class HeartDiseaseInput(BaseModel):
                 "ca": 0,
                 "thal": 1,
             }
-        }
-    }
+        },
+    )
 
 
 # Response schema
@@ -149,28 +337,25 @@ async def predict(input_data: HeartDiseaseInput):
                 raise HTTPException(status_code=503, detail="Model not available")
 
             # Log request
-            logger.info(f"Prediction request received: {input_data.model_dump()}")
-
-            # Convert input to DataFrame
-            input_df = pd.DataFrame([input_data.model_dump()])
-
-            # Preprocess
-            input_processed = preprocessor.transform(input_df)
+            data = input_data.model_dump()
+            logger.info(f"Prediction request received: {data}")
+
+            # Serve repeated inputs from the cache, otherwise preprocess and
+            # predict off the event loop, batched with other requests
+            row = tuple(data[name] for name in FEATURE_ORDER)
+            cached = prediction_cache.get(row)
+            if cached is not None:
+                CACHE_HIT_COUNT.inc()
+                prediction, probability = cached
+            else:
+                prediction, probability = await batcher.submit(row)
+                prediction_cache[row] = (prediction, probability)
 
             # Increment the counter
             PREDICTION_COUNT.inc()
 
-            # Make prediction
-            prediction = model.predict(input_processed)[0]
-            probability = model.predict_proba(input_processed)[0][1]
-
             # Determine risk level
-            if probability < 0.3:
-                risk_level = "Low"
-            elif probability < 0.7:
-                risk_level = "Medium"
-            else:
-                risk_level = "High"
+            risk_level = str(get_risk_level(probability))
 
             # Create response
             response = PredictionResponse(
@@ -183,12 +368,12 @@ async def predict(input_data: HeartDiseaseInput):
 
             # Log response
             logger.info(f"Prediction: {prediction}, Probability: {probability:.4f}")
-            PREDICTION_RESULTS.labels(
-                risk_level=risk_level, prediction_class=str(prediction)
-            ).inc()
+            PREDICTION_RESULT_CHILDREN[(risk_level, str(prediction))].inc()
 
             return response
 
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Prediction error: {str(e)}")
             raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
@@ -208,6 +393,3 @@ async def get_metrics():
     """Exposes Prometheus metrics in the correct text format"""
     return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
-
-if __name__ == "__main__":
-    uvicorn.run("app:app", host="0.0.0.0", port=8000, reload=True, log_level="info")
@@ -0,0 +1,19 @@
+"""
+Numerical kernels for model inference
+Compiled ahead of time by scripts/build_kernels.py, or JIT-compiled at startup
+"""
+
+import math
+
+import numpy as np
+
+
+def score_lr(X, W, b):
+    """Logistic regression probabilities for a batch of preprocessed rows"""
+    out = np.empty(X.shape[0])
+    for i in range(X.shape[0]):
+        s = b
+        for j in range(X.shape[1]):
+            s += X[i, j] * W[j]
+        out[i] = 1.0 / (1.0 + math.exp(-s))
+    return out
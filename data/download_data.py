@@ -3,6 +3,7 @@ Data Download Script for Heart Disease Dataset
 Downloads the UCI Heart Disease dataset from UCI ML Repository
 """
 
+import hashlib
 import os
 from pathlib import Path
 
@@ -20,6 +21,10 @@ PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 # Dataset URL
 DATASET_URL = "https://archive.ics.uci.edu/ml/machine-learning-databases/heart-disease/processed.cleveland.data"
 
+# Expected SHA-256 of the raw file; when set, a matching local copy is reused
+DATASET_SHA256 = os.getenv("DATASET_SHA256")
+CHUNK_SIZE = 64 * 1024
+
 # Column names for the dataset
 COLUMN_NAMES = [
     "age",
@@ -39,20 +44,53 @@ COLUMN_NAMES = [
 ]
 
 
+def file_sha256(path: Path):
+    """Compute the SHA-256 hex digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def download_data():
     """Download the Heart Disease dataset"""
-    print("Downloading Heart Disease dataset...")
+    raw_file = RAW_DIR / "heart_disease.csv"
 
     try:
-        response = requests.get(DATASET_URL)
-        response.raise_for_status()
-
-        # Save raw data
-        raw_file = RAW_DIR / "heart_disease.csv"
-        with open(raw_file, "wb") as f:
-            f.write(response.content)
-
-        print(f"✓ Data downloaded successfully to {raw_file}")
+        if (
+            DATASET_SHA256
+            and raw_file.exists()
+            and file_sha256(raw_file) == DATASET_SHA256
+        ):
+            print(f"✓ Raw data already present at {raw_file}, skipping download")
+        else:
+            print("Downloading Heart Disease dataset...")
+
+            # Stream to a temporary file, hashing each chunk as it arrives, so
+            # a failed or corrupt download never replaces an existing copy
+            part_file = raw_file.with_suffix(".part")
+            digest = hashlib.sha256()
+            try:
+                with requests.get(DATASET_URL, stream=True, timeout=30) as response:
+                    response.raise_for_status()
+                    with open(part_file, "wb") as f:
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            digest.update(chunk)
+                            f.write(chunk)
+
+                sha256 = digest.hexdigest()
+                if DATASET_SHA256 and sha256 != DATASET_SHA256:
+                    raise ValueError(
+                        f"Checksum mismatch: expected {DATASET_SHA256}, got {sha256}"
+                    )
+            except Exception:
+                part_file.unlink(missing_ok=True)
+                raise
+            part_file.replace(raw_file)
+
+            print(f"✓ Data downloaded successfully to {raw_file}")
+            print(f"✓ SHA-256: {sha256}")
 
         # Load and add column names
         df = pd.read_csv(raw_file, names=COLUMN_NAMES, na_values="?")
@@ -0,0 +1,26 @@
+"""
+Ahead-of-time Kernel Build Script
+Compiles the inference kernels into a native extension (api/heart_kernels)
+so the API never pays Numba JIT compilation at startup
+"""
+
+import sys
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from numba.pycc import CC
+
+from api.kernels import score_lr
+
+OUTPUT_DIR = Path(__file__).resolve().parent.parent / "api"
+
+cc = CC("heart_kernels")
+cc.output_dir = str(OUTPUT_DIR)
+cc.export("score_lr", "f8[:](f8[:, :], f8[:], f8)")(score_lr)
+
+
+if __name__ == "__main__":
+    cc.compile()
+    print(f"✓ Kernels compiled to {OUTPUT_DIR}")
@@ -42,7 +42,7 @@ def main():
 
         # 3. Split features and target
         logger.info("\n[3/6] Splitting features and target...")
-        X, y = split_features_target(df_clean)
+        X, y = split_features_target(df_clean, verbose=True)
 
         # 4. Preprocess features
         logger.info("\n[4/6] Preprocessing features...")
@@ -72,8 +72,8 @@ def main():
         # Train Logistic Regression
         trainer.train_logistic_regression(X_train, y_train, X_test, y_test)
 
-        # Train Random Forest
-        trainer.train_random_forest(X_train, y_train, X_test, y_test)
+        # Train Histogram Gradient Boosting
+        trainer.train_hgbt(X_train, y_train, X_test, y_test)
 
         # Select best model
         best_model, best_model_name = trainer.select_best_model(metric="roc_auc")
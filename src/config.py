@@ -2,7 +2,7 @@
 Configuration Management for MLOps Project
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 
 # Base paths
@@ -38,7 +38,7 @@ class ModelConfig:
 
     # Model hyperparameters
     logistic_regression_params: dict = None
-    random_forest_params: dict = None
+    hist_gradient_boosting_params: dict = None
 
     def __post_init__(self):
         if self.logistic_regression_params is None:
@@ -48,12 +48,13 @@ class ModelConfig:
                 "solver": "liblinear",
             }
 
-        if self.random_forest_params is None:
-            self.random_forest_params = {
-                "n_estimators": 100,
-                "max_depth": 10,
+        if self.hist_gradient_boosting_params is None:
+            self.hist_gradient_boosting_params = {
+                "max_iter": 200,
+                "max_depth": 6,
+                "learning_rate": 0.1,
+                "early_stopping": True,
                 "random_state": self.random_state,
-                "n_jobs": -1,
             }
 
 
@@ -79,10 +80,10 @@ class APIConfig:
 class Config:
     """Main configuration class"""
 
-    data: DataConfig = DataConfig()
-    model: ModelConfig = ModelConfig()
-    mlflow: MLflowConfig = MLflowConfig()
-    api: APIConfig = APIConfig()
+    data: DataConfig = field(default_factory=DataConfig)
+    model: ModelConfig = field(default_factory=ModelConfig)
+    mlflow: MLflowConfig = field(default_factory=MLflowConfig)
+    api: APIConfig = field(default_factory=APIConfig)
 
 
 # Global config instance
@@ -6,12 +6,29 @@ Handles missing values, feature encoding, and scaling
 from pathlib import Path
 
 import joblib
+import numpy as np
 import pandas as pd
 from sklearn.compose import ColumnTransformer
 from sklearn.impute import SimpleImputer
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 
+FEATURE_COLS = [
+    "age",
+    "sex",
+    "cp",
+    "trestbps",
+    "chol",
+    "fbs",
+    "restecg",
+    "thalach",
+    "exang",
+    "oldpeak",
+    "slope",
+    "ca",
+    "thal",
+]
+
 
 class HeartDiseasePreprocessor:
     """Preprocessor for Heart Disease dataset"""
@@ -60,8 +77,31 @@ class HeartDiseasePreprocessor:
     def fit(self, X):
         """Fit the preprocessing pipeline"""
         self.pipeline.fit(X)
+        self._cache_fitted_params()
         return self
 
+    def _cache_fitted_params(self):
+        """Cache fitted imputer/scaler statistics for transform_fast"""
+        input_features = list(self.pipeline.feature_names_in_)
+        numerical = self.pipeline.named_transformers_["numerical"]
+        categorical = self.pipeline.named_transformers_["categorical"]
+
+        self._num_idx = np.array(
+            [input_features.index(f) for f in self.numerical_features]
+        )
+        self._cat_idx = np.array(
+            [input_features.index(f) for f in self.categorical_features]
+        )
+        self._num_median = numerical.named_steps["imputer"].statistics_
+        self._num_mean = numerical.named_steps["scaler"].mean_
+        self._num_scale = numerical.named_steps["scaler"].scale_
+        self._cat_mode = categorical.named_steps["imputer"].statistics_
+
+        # Imputation values laid out in input column order
+        self._fill_values = np.empty(len(input_features))
+        self._fill_values[self._num_idx] = self._num_median
+        self._fill_values[self._cat_idx] = self._cat_mode
+
     def transform(self, X):
         """Transform the data"""
         X_transformed = self.pipeline.transform(X)
@@ -71,6 +111,24 @@ class HeartDiseasePreprocessor:
 
         return pd.DataFrame(X_transformed, columns=feature_names, index=X.index)
 
+    def transform_fast(self, X):
+        """Transform a raw ndarray (columns in fit order) without pandas
+
+        Equivalent to transform() but returns an ndarray, for the
+        inference path where the ColumnTransformer overhead dominates.
+        """
+        if not hasattr(self, "_fill_values"):
+            self._cache_fitted_params()
+
+        X = np.asarray(X, dtype=np.float64)
+        X = np.where(np.isnan(X), self._fill_values, X)
+
+        n_numerical = len(self._num_idx)
+        out = np.empty((X.shape[0], n_numerical + len(self._cat_idx)))
+        out[:, :n_numerical] = (X[:, self._num_idx] - self._num_mean) / self._num_scale
+        out[:, n_numerical:] = X[:, self._cat_idx]
+        return out
+
     def fit_transform(self, X):
         """Fit and transform the data"""
         self.fit(X)
@@ -82,9 +140,9 @@ class HeartDiseasePreprocessor:
         print(f"✓ Preprocessor saved to {path}")
 
     @staticmethod
-    def load(path: Path):
-        """Load a saved preprocessor"""
-        return joblib.load(path)
+    def load(path: Path, mmap_mode=None):
+        """Load a saved preprocessor, optionally memory-mapping its arrays"""
+        return joblib.load(path, mmap_mode=mmap_mode)
 
 
 def load_data(file_path: Path):
@@ -96,26 +154,34 @@ def load_data(file_path: Path):
 
 def clean_data(df: pd.DataFrame):
     """Clean the dataset"""
-    print(f"Missing values before cleaning:\n{df.isnull().sum()}")
+    # Scan for missing values once and reuse the mask for logging and filtering
+    null_mask = df.isna().to_numpy()
+    null_counts = pd.Series(null_mask.sum(axis=0), index=df.columns)
+    print(f"Missing values before cleaning:\n{null_counts}")
 
     # Remove rows with too many missing values (>50%)
     threshold = len(df.columns) * 0.5
-    df_clean = df.dropna(thresh=threshold)
+    keep = (len(df.columns) - null_mask.sum(axis=1)) >= threshold
+    df_clean = df.iloc[keep]
 
     print(f"✓ Data cleaned: {df_clean.shape}")
-    print(f"Missing values after cleaning:\n{df_clean.isnull().sum()}")
+    null_counts = pd.Series(null_mask[keep].sum(axis=0), index=df.columns)
+    print(f"Missing values after cleaning:\n{null_counts}")
 
     return df_clean
 
 
-def split_features_target(df: pd.DataFrame, target_col: str = "target"):
+def split_features_target(
+    df: pd.DataFrame, target_col: str = "target", verbose: bool = False
+):
     """Split features and target"""
-    X = df.drop(columns=[target_col])
+    X = df.loc[:, FEATURE_COLS]
     y = df[target_col]
 
     print(f"✓ Features shape: {X.shape}")
     print(f"✓ Target shape: {y.shape}")
-    print(f"✓ Target distribution:\n{y.value_counts()}")
+    if verbose:
+        print(f"✓ Target distribution:\n{y.value_counts()}")
 
     return X, y
 
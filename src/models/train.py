@@ -5,16 +5,19 @@ Model Training with MLflow Tracking
 from pathlib import Path
 
 import joblib
-import matplotlib.pyplot as plt
 import mlflow
 import mlflow.sklearn
 import pandas as pd
-import seaborn as sns
-from sklearn.ensemble import RandomForestClassifier
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+from sklearn.base import clone
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.inspection import permutation_importance
 from sklearn.linear_model import LogisticRegression
 from sklearn.metrics import (accuracy_score, confusion_matrix, f1_score,
                              precision_score, recall_score, roc_auc_score)
-from sklearn.model_selection import cross_val_score, train_test_split
+from sklearn.model_selection import (StratifiedKFold, cross_val_score,
+                                     train_test_split)
 
 from src.config import config
 from src.data.preprocessing import (HeartDiseasePreprocessor, clean_data,
@@ -28,6 +31,11 @@ class ModelTrainer:
         self.config = config
         self.models = {}
         self.results = {}
+        self.cv = StratifiedKFold(
+            n_splits=config.model.cv_folds,
+            shuffle=True,
+            random_state=config.model.random_state,
+        )
         mlflow.set_tracking_uri(config.mlflow.tracking_uri)
         mlflow.set_experiment(config.mlflow.experiment_name)
 
@@ -54,13 +62,7 @@ class ModelTrainer:
             metrics = self._calculate_metrics(y_test, y_pred, y_pred_proba)
 
             # Cross-validation
-            cv_scores = cross_val_score(
-                model,
-                X_train,
-                y_train,
-                cv=self.config.model.cv_folds,
-                scoring="roc_auc",
-            )
+            cv_scores = self._cross_validate(model, X_train, y_train)
             metrics["cv_roc_auc_mean"] = cv_scores.mean()
             metrics["cv_roc_auc_std"] = cv_scores.std()
 
@@ -82,19 +84,19 @@ class ModelTrainer:
 
             return model, metrics
 
-    def train_random_forest(self, X_train, y_train, X_test, y_test):
-        """Train Random Forest model"""
+    def train_hgbt(self, X_train, y_train, X_test, y_test):
+        """Train Histogram-based Gradient Boosting model"""
         print("\n" + "=" * 50)
-        print("Training Random Forest")
+        print("Training Histogram Gradient Boosting")
         print("=" * 50)
 
-        with mlflow.start_run(run_name="random_forest"):
+        with mlflow.start_run(run_name="hist_gradient_boosting"):
             # Log parameters
-            params = self.config.model.random_forest_params
+            params = self.config.model.hist_gradient_boosting_params
             mlflow.log_params(params)
 
             # Train model
-            model = RandomForestClassifier(**params)
+            model = HistGradientBoostingClassifier(**params)
             model.fit(X_train, y_train)
 
             # Predictions
@@ -105,24 +107,25 @@ class ModelTrainer:
             metrics = self._calculate_metrics(y_test, y_pred, y_pred_proba)
 
             # Cross-validation
-            cv_scores = cross_val_score(
-                model,
-                X_train,
-                y_train,
-                cv=self.config.model.cv_folds,
-                scoring="roc_auc",
-            )
+            cv_scores = self._cross_validate(model, X_train, y_train)
             metrics["cv_roc_auc_mean"] = cv_scores.mean()
             metrics["cv_roc_auc_std"] = cv_scores.std()
 
             # Log metrics
             mlflow.log_metrics(metrics)
 
-            # Log feature importance
+            # Log feature importance (HGBT has no impurity-based importances)
+            importances = permutation_importance(
+                model,
+                X_test,
+                y_test,
+                scoring="roc_auc",
+                random_state=self.config.model.random_state,
+            )
             feature_importance = pd.DataFrame(
                 {
                     "feature": range(X_train.shape[1]),
-                    "importance": model.feature_importances_,
+                    "importance": importances.importances_mean,
                 }
             ).sort_values("importance", ascending=False)
 
@@ -132,17 +135,33 @@ class ModelTrainer:
             mlflow.sklearn.log_model(model, "model")
 
             # Save confusion matrix
-            self._plot_confusion_matrix(y_test, y_pred, "rf_confusion_matrix.png")
-            mlflow.log_artifact("rf_confusion_matrix.png")
+            self._plot_confusion_matrix(y_test, y_pred, "hgbt_confusion_matrix.png")
+            mlflow.log_artifact("hgbt_confusion_matrix.png")
 
-            self.models["random_forest"] = model
-            self.results["random_forest"] = metrics
+            self.models["hist_gradient_boosting"] = model
+            self.results["hist_gradient_boosting"] = metrics
 
-            print("✓ Random Forest trained")
+            print("✓ Histogram Gradient Boosting trained")
             self._print_metrics(metrics)
 
             return model, metrics
 
+    def _cross_validate(self, model, X_train, y_train):
+        """Cross-validate ROC-AUC with the folds run in parallel"""
+        # Folds already occupy every core, so avoid nested parallelism
+        if "n_jobs" in model.get_params():
+            model = clone(model).set_params(n_jobs=1)
+
+        return cross_val_score(
+            model,
+            X_train,
+            y_train,
+            cv=self.cv,
+            scoring="roc_auc",
+            n_jobs=-1,
+            pre_dispatch="2*n_jobs",
+        )
+
     def _calculate_metrics(self, y_true, y_pred, y_pred_proba):
         """Calculate evaluation metrics"""
         return {
@@ -161,6 +180,14 @@ class ModelTrainer:
 
     def _plot_confusion_matrix(self, y_true, y_pred, filename):
         """Plot and save confusion matrix"""
+        # Plotting libraries are heavy, so import them only when plotting,
+        # with the headless Agg backend
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+
         cm = confusion_matrix(y_true, y_pred)
         plt.figure(figsize=(8, 6))
         sns.heatmap(cm, annot=True, fmt="d", cmap="Blues")
@@ -183,10 +210,24 @@ class ModelTrainer:
         return self.models[best_model_name], best_model_name
 
     def save_model(self, model, model_path: Path):
-        """Save model to disk"""
+        """Save model to disk, alongside an ONNX export for serving"""
+        # Convert before writing anything: the API serves any best_model.onnx
+        # it finds, so a failed export must not leave the previous model's
+        # ONNX file next to a new pickle
+        onnx_path = model_path.with_suffix(".onnx")
+        onnx_model = convert_sklearn(
+            model,
+            initial_types=[("X", FloatTensorType([None, model.n_features_in_]))],
+            options={"zipmap": False},
+        )
+
         joblib.dump(model, model_path)
         print(f"✓ Model saved to {model_path}")
 
+        with open(onnx_path, "wb") as f:
+            f.write(onnx_model.SerializeToString())
+        print(f"✓ ONNX model saved to {onnx_path}")
+
 
 if __name__ == "__main__":
     # Load and preprocess data
@@ -210,7 +251,7 @@ if __name__ == "__main__":
     # Train models
     trainer = ModelTrainer(config)
     trainer.train_logistic_regression(X_train, y_train, X_test, y_test)
-    trainer.train_random_forest(X_train, y_train, X_test, y_test)
+    trainer.train_hgbt(X_train, y_train, X_test, y_test)
 
     # Select and save best model
     best_model, best_model_name = trainer.select_best_model()
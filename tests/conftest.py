@@ -0,0 +1,113 @@
+"""
+Shared pytest fixtures
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import httpx
+import numpy as np
+import pandas as pd
+import pytest
+import pytest_asyncio
+import sklearn
+from fastapi.testclient import TestClient
+
+from src.data import preprocessing
+from src.data.preprocessing import FEATURE_COLS, HeartDiseasePreprocessor
+
+COLS = FEATURE_COLS + ["target"]
+
+# One row per patient, in COLS order. Kept float64: the scaling assertions
+# check means to 1e-10, which float32 rounding would not meet.
+SAMPLE_ARR = np.array(
+    [
+        [63, 1, 3, 145, 233, 1, 0, 150, 0, 2.3, 0, 0, 1, 1],
+        [37, 1, 2, 130, 250, 0, 1, 187, 0, 3.5, 0, 0, 2, 1],
+        [41, 0, 1, 130, 204, 0, 0, 172, 0, 1.4, 2, 0, 2, 0],
+        [56, 1, 1, 120, 236, 0, 1, 178, 0, 0.8, 2, 0, 2, 0],
+        [57, 0, 0, 120, 354, 0, 1, 163, 1, 0.6, 2, 0, 2, 0],
+    ],
+    dtype=np.float64,
+)
+
+# Same rows with a few missing age, sex, cp and trestbps values
+SAMPLE_ARR_MISSING = SAMPLE_ARR.copy()
+SAMPLE_ARR_MISSING[[1, 4, 2, 3], [0, 1, 2, 3]] = np.nan
+
+
+@pytest.fixture(scope="session")
+def sample_data():
+    """Create sample data for testing"""
+    return pd.DataFrame(SAMPLE_ARR, columns=COLS)
+
+
+@pytest.fixture(scope="session")
+def sample_data_with_missing():
+    """Create sample data with missing values"""
+    return pd.DataFrame(SAMPLE_ARR_MISSING, columns=COLS)
+
+
+@pytest.fixture(scope="session")
+def fitted_preprocessor(request, sample_data):
+    """Preprocessor fitted on sample data, shared by read-only tests
+
+    The fitted pickle is kept in the pytest cache and reused by later
+    sessions. Its filename hashes the sample data, the preprocessing module
+    source and the sklearn version, so a change to any of them refits.
+    """
+    cache = getattr(request.config, "cache", None)
+    if cache is not None:
+        digest = hashlib.sha256(
+            pd.util.hash_pandas_object(sample_data).to_numpy().tobytes()
+            + Path(preprocessing.__file__).read_bytes()
+            + sklearn.__version__.encode()
+        ).hexdigest()[:16]
+        path = cache.mkdir("preprocessor") / f"preprocessor-{digest}.pkl"
+        if path.exists():
+            return HeartDiseasePreprocessor.load(path)
+
+    preprocessor = HeartDiseasePreprocessor()
+    preprocessor.fit(sample_data.drop(columns=["target"]))
+
+    if cache is not None:
+        # Write then rename, so concurrent xdist workers never read a partial file
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        preprocessor.save(tmp_path)
+        tmp_path.replace(path)
+    return preprocessor
+
+
+@pytest.fixture(scope="session")
+def client():
+    """API test client, started once for the whole test session (per xdist worker)
+
+    Importing api.app loads the model artifacts, so it is kept out of test
+    collection. Entering the client runs the app's startup warmup.
+    """
+    from api.app import app
+
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest_asyncio.fixture
+async def async_client(client):
+    """Async client over the in-process ASGI app, for concurrent requests"""
+    transport = httpx.ASGITransport(app=client.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+@pytest.fixture(scope="session")
+def model_available(client):
+    """Whether the API loaded its model artifacts, checked once per session"""
+    return client.get("/health").json()["status"] == "healthy"
+
+
+@pytest.fixture
+def require_model(model_available):
+    """Skip tests that need a loaded model before they hit /predict"""
+    if not model_available:
+        pytest.skip("Model artifacts not available")
@@ -2,24 +2,83 @@
 Unit tests for FastAPI application
 """
 
-import sys
-from pathlib import Path
+import asyncio
+from typing import Literal
 
+import numpy as np
+import orjson
 import pytest
-from fastapi.testclient import TestClient
-
-# Add project root to path
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
-from api.app import app
-
-client = TestClient(app)
+from prometheus_client import REGISTRY
+from pydantic import BaseModel, ConfigDict, Field
+
+from api.kernels import score_lr
+
+BASE_PAYLOAD = {
+    "age": 63,
+    "sex": 1,
+    "cp": 3,
+    "trestbps": 145,
+    "chol": 233,
+    "fbs": 1,
+    "restecg": 0,
+    "thalach": 150,
+    "exang": 0,
+    "oldpeak": 2.3,
+    "slope": 0,
+    "ca": 0,
+    "thal": 1,
+}
+BASE_PAYLOAD_BYTES = orjson.dumps(BASE_PAYLOAD)
+JSON_HEADERS = {"content-type": "application/json"}
+
+# Valid inputs spanning both classes, checked row by row
+SMOKE_PAYLOADS = [
+    BASE_PAYLOAD,
+    {**BASE_PAYLOAD, "age": 37, "sex": 0, "cp": 2, "oldpeak": 0.0, "thal": 2},
+    {**BASE_PAYLOAD, "age": 67, "chol": 286, "exang": 1, "ca": 3, "thal": 3},
+]
+
+# field -> [(value, acceptable status codes)] for field range validation
+VALIDATION_CASES = {
+    "age": [(50, (200, 503)), (-1, (422,)), (150, (422,)), (200, (422,))],
+    "sex": [(0, (200, 503)), (1, (200, 503)), (2, (422,))],
+}
+
+
+class PredictResponse(BaseModel):
+    """Expected /predict response schema, checked in one validation call"""
+
+    model_config = ConfigDict(strict=True, extra="forbid")
+
+    prediction: Literal[0, 1]
+    probability: float = Field(..., ge=0, le=1)
+    risk_level: Literal["Low", "Medium", "High"]
+    message: str
+    timestamp: str
+
+
+def _post(client, **overrides):
+    """POST BASE_PAYLOAD with field overrides to /predict, encoded by orjson
+
+    Works with both the sync and the async client; the latter returns an
+    awaitable.
+    """
+    if overrides:
+        body = orjson.dumps({**BASE_PAYLOAD, **overrides})
+    else:
+        body = BASE_PAYLOAD_BYTES
+    return client.post("/predict", content=body, headers=JSON_HEADERS)
+
+
+def _run_batch(client, payloads):
+    """POST each payload to /predict over the shared client"""
+    return [_post(client, **payload) for payload in payloads]
 
 
 class TestAPIEndpoints:
     """Test API endpoints"""
 
-    def test_root_endpoint(self):
+    def test_root_endpoint(self, client):
         """Test root endpoint"""
         response = client.get("/")
         assert response.status_code == 200
@@ -28,7 +87,7 @@ class TestAPIEndpoints:
         assert "version" in data
         assert data["status"] == "active"
 
-    def test_health_endpoint(self):
+    def test_health_endpoint(self, client):
         """Test health check endpoint"""
         response = client.get("/health")
         assert response.status_code == 200
@@ -36,39 +95,62 @@ class TestAPIEndpoints:
         assert "status" in data
         assert "timestamp" in data
 
-    def test_predict_endpoint_valid_input(self):
-        """Test prediction with valid input"""
-        payload = {
-            "age": 63,
-            "sex": 1,
-            "cp": 3,
-            "trestbps": 145,
-            "chol": 233,
-            "fbs": 1,
-            "restecg": 0,
-            "thalach": 150,
-            "exang": 0,
-            "oldpeak": 2.3,
-            "slope": 0,
-            "ca": 0,
-            "thal": 1,
-        }
+    def test_startup_runs_warmup(self, client, monkeypatch):
+        """Test that app startup warms the inference path"""
+        from fastapi.testclient import TestClient
 
-        response = client.post("/predict", json=payload)
+        import api.app as m
+
+        calls = []
+        monkeypatch.setattr(m, "warmup", lambda: calls.append(True))
+
+        with TestClient(m.app):
+            pass
+
+        assert calls == [True]
 
-        # If model is loaded
-        if response.status_code == 200:
+    def test_predict_endpoint_valid_input(self, client, require_model):
+        """Test prediction with valid input"""
+        for response in _run_batch(client, SMOKE_PAYLOADS):
+            assert response.status_code == 200
             data = response.json()
             assert "prediction" in data
             assert "probability" in data
             assert "risk_level" in data
             assert data["prediction"] in [0, 1]
             assert 0 <= data["probability"] <= 1
-        # If model not loaded (503 Service Unavailable)
-        else:
-            assert response.status_code == 503
 
-    def test_predict_endpoint_invalid_input(self):
+    def test_predict_endpoint_cached_input(self, client, require_model):
+        """Test that repeated inputs are served from the prediction cache"""
+        first = _post(client, age=58, chol=240)
+        hits_before = REGISTRY.get_sample_value("cache_hit_total")
+        second = _post(client, age=58, chol=240)
+
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert REGISTRY.get_sample_value("cache_hit_total") == hits_before + 1
+        assert first.json()["probability"] == second.json()["probability"]
+
+    @pytest.mark.asyncio
+    async def test_predict_endpoint_batch_failure(
+        self, async_client, require_model, monkeypatch
+    ):
+        """Test that an inference error fails every request in the batch"""
+        import api.app as m
+
+        def failing_infer(rows):
+            raise RuntimeError("inference failed")
+
+        monkeypatch.setattr(m, "_infer", failing_infer)
+
+        # Distinct ages so none of the requests is served from the cache
+        responses = await asyncio.gather(
+            *(_post(async_client, age=age) for age in (21, 22, 23))
+        )
+
+        assert [r.status_code for r in responses] == [500, 500, 500]
+
+    def test_predict_endpoint_invalid_input(self, client):
         """Test prediction with invalid input"""
         # Missing required field
         payload = {
@@ -80,25 +162,9 @@ class TestAPIEndpoints:
         response = client.post("/predict", json=payload)
         assert response.status_code == 422  # Validation error
 
-    def test_predict_endpoint_out_of_range(self):
-        """Test prediction with out of range values"""
-        payload = {
-            "age": 200,  # Invalid age
-            "sex": 1,
-            "cp": 3,
-            "trestbps": 145,
-            "chol": 233,
-            "fbs": 1,
-            "restecg": 0,
-            "thalach": 150,
-            "exang": 0,
-            "oldpeak": 2.3,
-            "slope": 0,
-            "ca": 0,
-            "thal": 1,
-        }
-
-        response = client.post("/predict", json=payload)
+    def test_predict_endpoint_unknown_field(self, client):
+        """Test prediction rejects fields outside the schema"""
+        response = _post(client, bmi=27.5)  # Not a model feature
         assert response.status_code == 422
 
     # def test_metrics_endpoint(self):
@@ -107,134 +173,124 @@ class TestAPIEndpoints:
     #     assert response.status_code == 200
     #     data = response.json()
     #     assert "total_predictions" in data
-    def test_metrics_endpoint(self):
+    def test_metrics_endpoint(self, client):
         """Test metrics endpoint"""
         response = client.get("/metrics")
         assert response.status_code == 200
-        
+
         # Change this: instead of response.json(), use response.text
         content = response.text
-        
+
         # Verify specific Prometheus metrics are present
         # Based on your logs, these are the expected keys:
         assert "python_gc_objects_collected_total" in content
         assert "feature_cholesterol_mgdl" in content
-        
+
         # Optional: Verify the Content-Type header is correct for Prometheus
         assert "text/plain" in response.headers["Content-Type"]
 
+
 class TestAPIValidation:
     """Test input validation"""
 
-    def test_age_validation(self):
-        """Test age field validation"""
-        base_payload = {
-            "sex": 1,
-            "cp": 3,
-            "trestbps": 145,
-            "chol": 233,
-            "fbs": 1,
-            "restecg": 0,
-            "thalach": 150,
-            "exang": 0,
-            "oldpeak": 2.3,
-            "slope": 0,
-            "ca": 0,
-            "thal": 1,
-        }
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("field", list(VALIDATION_CASES))
+    async def test_field_validation(self, async_client, field):
+        """Test field range validation, sending each field's values concurrently"""
+        cases = VALIDATION_CASES[field]
+        responses = await asyncio.gather(
+            *(_post(async_client, **{field: value}) for value, _ in cases)
+        )
 
-        # Valid age
-        payload = {**base_payload, "age": 50}
-        response = client.post("/predict", json=payload)
-        assert response.status_code in [200, 503]
+        mismatches = [
+            (value, response.status_code)
+            for (value, expected), response in zip(cases, responses)
+            if response.status_code not in expected
+        ]
+        assert not mismatches
 
-        # Invalid age (negative)
-        payload = {**base_payload, "age": -1}
-        response = client.post("/predict", json=payload)
-        assert response.status_code == 422
 
-        # Invalid age (too high)
-        payload = {**base_payload, "age": 150}
-        response = client.post("/predict", json=payload)
-        assert response.status_code == 422
+class TestAPIResponse:
+    """Test API response structure"""
 
-    def test_sex_validation(self):
-        """Test sex field validation"""
-        base_payload = {
-            "age": 50,
-            "cp": 3,
-            "trestbps": 145,
-            "chol": 233,
-            "fbs": 1,
-            "restecg": 0,
-            "thalach": 150,
-            "exang": 0,
-            "oldpeak": 2.3,
-            "slope": 0,
-            "ca": 0,
-            "thal": 1,
-        }
+    def test_response_structure(self, client, require_model):
+        """Test that response has correct structure"""
+        response = _post(client)
+        assert response.status_code == 200
 
-        # Valid sex values
-        for sex in [0, 1]:
-            payload = {**base_payload, "sex": sex}
-            response = client.post("/predict", json=payload)
-            assert response.status_code in [200, 503]
+        PredictResponse.model_validate(response.json())
 
-        # Invalid sex
-        payload = {**base_payload, "sex": 2}
-        response = client.post("/predict", json=payload)
-        assert response.status_code == 422
+    def test_risk_level_bands(self):
+        """Test risk level thresholds for scalar and batched probabilities"""
+        from api.app import get_risk_level
 
+        assert get_risk_level(0.1) == "Low"
+        assert get_risk_level(0.3) == "Medium"
+        assert get_risk_level(0.7) == "High"
 
-class TestAPIResponse:
-    """Test API response structure"""
+        levels = get_risk_level(np.array([0.0, 0.29, 0.5, 0.69, 0.99]))
+        assert list(levels) == ["Low", "Low", "Medium", "Medium", "High"]
 
-    def test_response_structure(self):
-        """Test that response has correct structure"""
-        payload = {
-            "age": 63,
-            "sex": 1,
-            "cp": 3,
-            "trestbps": 145,
-            "chol": 233,
-            "fbs": 1,
-            "restecg": 0,
-            "thalach": 150,
-            "exang": 0,
-            "oldpeak": 2.3,
-            "slope": 0,
-            "ca": 0,
-            "thal": 1,
-        }
 
-        response = client.post("/predict", json=payload)
+class TestKernels:
+    """Test inference kernels"""
 
-        if response.status_code == 200:
-            data = response.json()
+    def test_score_lr(self):
+        """Test logistic regression kernel against a NumPy sigmoid"""
+        rng = np.random.default_rng(0)
+        X = rng.normal(size=(4, 13))
+        W = rng.normal(size=13)
+        b = 0.5
 
-            # Check required fields
-            required_fields = [
-                "prediction",
-                "probability",
-                "risk_level",
-                "message",
-                "timestamp",
-            ]
-            for field in required_fields:
-                assert field in data
-
-            # Check data types
-            assert isinstance(data["prediction"], int)
-            assert isinstance(data["probability"], float)
-            assert isinstance(data["risk_level"], str)
-            assert isinstance(data["message"], str)
-            assert isinstance(data["timestamp"], str)
-
-            # Check value ranges
-            assert data["prediction"] in [0, 1]
-            assert 0 <= data["probability"] <= 1
-            assert data["risk_level"] in ["Low", "Medium", "High"]
+        expected = 1.0 / (1.0 + np.exp(-(X @ W + b)))
+        np.testing.assert_allclose(score_lr(X, W, b), expected)
+
+    def test_served_kernel_matches_model(self, require_model):
+        """Test the compiled kernel the API serves against predict_proba"""
+        import api.app as m
+
+        if m.lr_weights is None:
+            pytest.skip("Loaded model is not scored by the LR kernel")
+
+        rows = [[p[name] for name in m.FEATURE_ORDER] for p in SMOKE_PAYLOADS]
+        X = m.preprocessor.transform_fast(np.array(rows, dtype=np.float64))
+
+        np.testing.assert_allclose(
+            m._score_lr(X, *m.lr_weights), m.model.predict_proba(X)[:, 1]
+        )
+
+    def test_onnx_backend_matches_model(self, require_model, monkeypatch, tmp_path):
+        """Test that _infer on an ONNX session scores like the sklearn model"""
+        from skl2onnx import convert_sklearn
+        from skl2onnx.common.data_types import FloatTensorType
+        from sklearn.ensemble import HistGradientBoostingClassifier
+
+        import api.app as m
+
+        rng = np.random.default_rng(0)
+        rows = rng.normal(50, 20, size=(64, len(m.FEATURE_ORDER)))
+        X = m.preprocessor.transform_fast(rows)
+        y = (X[:, 0] > np.median(X[:, 0])).astype(int)
+        hgbt = HistGradientBoostingClassifier(max_iter=20, random_state=0).fit(X, y)
+
+        onnx_model = convert_sklearn(
+            hgbt,
+            initial_types=[("X", FloatTensorType([None, X.shape[1]]))],
+            options={"zipmap": False},
+        )
+        onnx_path = tmp_path / "best_model.onnx"
+        onnx_path.write_bytes(onnx_model.SerializeToString())
+
+        assert m._load_onnx_session(tmp_path / "missing.onnx") is None
+        session = m._load_onnx_session(onnx_path)
+        monkeypatch.setattr(m, "lr_weights", None)
+        monkeypatch.setattr(m, "onnx_session", session)
+        monkeypatch.setattr(m, "model", hgbt)
+
+        probabilities = np.array([p for _, p in m._infer(rows)])
+        np.testing.assert_allclose(
+            probabilities, hgbt.predict_proba(X)[:, 1], rtol=0, atol=1e-5
+        )
 
 
 if __name__ == "__main__":
@@ -2,65 +2,25 @@
 Unit tests for data preprocessing
 """
 
-import sys
-from pathlib import Path
-
 import numpy as np
-import pandas as pd
 import pytest
 
-# Add src to path
-sys.path.insert(0, str(Path(__file__).parent.parent))
-
 from src.data.preprocessing import (HeartDiseasePreprocessor, clean_data,
                                     split_features_target)
 
 
-@pytest.fixture
-def sample_data():
-    """Create sample data for testing"""
-    return pd.DataFrame(
-        {
-            "age": [63, 37, 41, 56, 57],
-            "sex": [1, 1, 0, 1, 0],
-            "cp": [3, 2, 1, 1, 0],
-            "trestbps": [145, 130, 130, 120, 120],
-            "chol": [233, 250, 204, 236, 354],
-            "fbs": [1, 0, 0, 0, 0],
-            "restecg": [0, 1, 0, 1, 1],
-            "thalach": [150, 187, 172, 178, 163],
-            "exang": [0, 0, 0, 0, 1],
-            "oldpeak": [2.3, 3.5, 1.4, 0.8, 0.6],
-            "slope": [0, 0, 2, 2, 2],
-            "ca": [0, 0, 0, 0, 0],
-            "thal": [1, 2, 2, 2, 2],
-            "target": [1, 1, 0, 0, 0],
-        }
-    )
+@pytest.fixture(scope="module")
+def X_transformed(fitted_preprocessor, sample_data):
+    """Sample data transformed once by the shared fitted preprocessor"""
+    return fitted_preprocessor.transform(sample_data.drop(columns=["target"]))
 
 
-@pytest.fixture
-def sample_data_with_missing():
-    """Create sample data with missing values"""
-    data = pd.DataFrame(
-        {
-            "age": [63, np.nan, 41, 56, 57],
-            "sex": [1, 1, 0, 1, np.nan],
-            "cp": [3, 2, np.nan, 1, 0],
-            "trestbps": [145, 130, 130, np.nan, 120],
-            "chol": [233, 250, 204, 236, 354],
-            "fbs": [1, 0, 0, 0, 0],
-            "restecg": [0, 1, 0, 1, 1],
-            "thalach": [150, 187, 172, 178, 163],
-            "exang": [0, 0, 0, 0, 1],
-            "oldpeak": [2.3, 3.5, 1.4, 0.8, 0.6],
-            "slope": [0, 0, 2, 2, 2],
-            "ca": [0, 0, 0, 0, 0],
-            "thal": [1, 2, 2, 2, 2],
-            "target": [1, 1, 0, 0, 0],
-        }
+@pytest.fixture(scope="module")
+def X_missing_transformed(fitted_preprocessor, sample_data_with_missing):
+    """Sample data with missing values, transformed once"""
+    return fitted_preprocessor.transform(
+        sample_data_with_missing.drop(columns=["target"])
     )
-    return data
 
 
 class TestPreprocessor:
@@ -86,31 +46,28 @@ class TestPreprocessor:
         )
         assert not X_transformed.isnull().any().any()
 
-    def test_transform_handles_missing_values(self, sample_data_with_missing):
+    def test_transform_handles_missing_values(self, X_missing_transformed):
         """Test that transform handles missing values"""
-        preprocessor = HeartDiseasePreprocessor()
+        # Check no missing values in output
+        assert not X_missing_transformed.isnull().any().any()
+
+    def test_transform_fast_matches_transform(
+        self, fitted_preprocessor, sample_data_with_missing, X_missing_transformed
+    ):
+        """Test that transform_fast reproduces transform on a raw ndarray"""
         X = sample_data_with_missing.drop(columns=["target"])
 
-        X_transformed = preprocessor.fit_transform(X)
+        X_fast = fitted_preprocessor.transform_fast(X.to_numpy())
 
-        # Check no missing values in output
-        assert not X_transformed.isnull().any().any()
+        np.testing.assert_allclose(X_fast, X_missing_transformed.to_numpy())
 
-    def test_numerical_scaling(self, sample_data):
+    def test_numerical_scaling(self, fitted_preprocessor, X_transformed):
         """Test that numerical features are scaled"""
-        preprocessor = HeartDiseasePreprocessor()
-        X = sample_data.drop(columns=["target"])
-
-        X_transformed = preprocessor.fit_transform(X)
-
         # Check that numerical features have mean ≈ 0 and std ≈ 1
-        numerical_cols = preprocessor.numerical_features
-        for col in numerical_cols:
-            if col in X_transformed.columns:
-                mean = X_transformed[col].mean()
-                std = X_transformed[col].std()
-                assert abs(mean) < 1e-10  # Close to 0
-                assert abs(std - 1) < 0.2  # Close to 1 (relaxed for small samples)
+        arr = X_transformed[fitted_preprocessor.numerical_features].to_numpy()
+        assert np.allclose(arr.mean(axis=0), 0, atol=1e-10)
+        # Sample std, relaxed for small samples
+        assert np.allclose(arr.std(axis=0, ddof=1), 1, atol=0.2)
 
 
 class TestDataFunctions:
@@ -123,6 +80,16 @@ class TestDataFunctions:
         # Should not drop rows with few missing values
         assert len(df_clean) > 0
 
+    def test_clean_data_drops_mostly_missing_rows(self, sample_data):
+        """Test that rows with more than half their values missing are dropped"""
+        df = sample_data.astype(float)
+        df.iloc[0, :10] = np.nan
+
+        df_clean = clean_data(df)
+
+        assert len(df_clean) == len(df) - 1
+        assert df.index[0] not in df_clean.index
+
     def test_split_features_target(self, sample_data):
         """Test split_features_target function"""
         X, y = split_features_target(sample_data, target_col="target")
@@ -140,27 +107,37 @@ class TestDataFunctions:
 class TestPreprocessorSaveLoad:
     """Test preprocessor save and load"""
 
-    def test_save_and_load(self, sample_data, tmp_path):
+    def test_save_and_load(self, fitted_preprocessor, sample_data, tmp_path):
         """Test saving and loading preprocessor"""
-        preprocessor = HeartDiseasePreprocessor()
         X = sample_data.drop(columns=["target"])
 
-        # Fit preprocessor
-        preprocessor.fit(X)
-
         # Save
         save_path = tmp_path / "test_preprocessor.pkl"
-        preprocessor.save(save_path)
+        fitted_preprocessor.save(save_path)
 
         # Load
         loaded_preprocessor = HeartDiseasePreprocessor.load(save_path)
 
         # Test that loaded preprocessor works
-        X_transformed_original = preprocessor.transform(X)
+        X_transformed_original = fitted_preprocessor.transform(X)
         X_transformed_loaded = loaded_preprocessor.transform(X)
 
         # Results should be identical
-        pd.testing.assert_frame_equal(X_transformed_original, X_transformed_loaded)
+        np.testing.assert_array_equal(
+            X_transformed_original.to_numpy(), X_transformed_loaded.to_numpy()
+        )
+
+    def test_load_memory_mapped(self, fitted_preprocessor, sample_data, tmp_path):
+        """Test that a memory-mapped load, as used by the API, still transforms"""
+        X = sample_data.drop(columns=["target"]).to_numpy()
+
+        save_path = tmp_path / "test_preprocessor.pkl"
+        fitted_preprocessor.save(save_path)
+        loaded_preprocessor = HeartDiseasePreprocessor.load(save_path, mmap_mode="r")
+
+        np.testing.assert_array_equal(
+            loaded_preprocessor.transform_fast(X), fitted_preprocessor.transform_fast(X)
+        )
 
 
 if __name__ == "__main__":
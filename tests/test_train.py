@@ -0,0 +1,76 @@
+"""
+Unit tests for model training
+"""
+
+import numpy as np
+import onnxruntime as ort
+import pytest
+from sklearn.base import clone
+from sklearn.ensemble import HistGradientBoostingClassifier
+
+from src.models import train
+from src.models.train import ModelTrainer
+
+
+@pytest.fixture
+def trainer(monkeypatch):
+    """Model trainer that doesn't create an MLflow experiment"""
+    monkeypatch.setattr(train.mlflow, "set_tracking_uri", lambda uri: None)
+    monkeypatch.setattr(train.mlflow, "set_experiment", lambda name: None)
+    return ModelTrainer(train.config)
+
+
+@pytest.fixture(scope="module")
+def hgbt_data():
+    """Small HGBT model with the data it was fitted on"""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, 13)).astype(np.float32)
+    y = (X[:, 0] + X[:, 3] > 0).astype(int)
+    model = HistGradientBoostingClassifier(max_iter=20, random_state=0).fit(X, y)
+    return model, X
+
+
+class TestSaveModel:
+    """Test model persistence and ONNX export"""
+
+    def test_onnx_export_matches_predict_proba(self, trainer, hgbt_data, tmp_path):
+        """Test that the ONNX export scores like the sklearn model"""
+        model, X = hgbt_data
+        model_path = tmp_path / "best_model.pkl"
+
+        trainer.save_model(model, model_path)
+
+        session = ort.InferenceSession(
+            str(model_path.with_suffix(".onnx")),
+            providers=["CPUExecutionProvider"],
+        )
+        onnx_proba = session.run(None, {"X": X})[1][:, 1]
+        np.testing.assert_allclose(
+            onnx_proba, model.predict_proba(X)[:, 1], rtol=0, atol=1e-5
+        )
+
+    def test_failed_export_keeps_previous_artifacts(
+        self, trainer, hgbt_data, tmp_path, monkeypatch
+    ):
+        """Test that a failed ONNX conversion writes neither artifact"""
+        model, X = hgbt_data
+        model_path = tmp_path / "best_model.pkl"
+        trainer.save_model(model, model_path)
+        saved = model_path.read_bytes(), model_path.with_suffix(".onnx").read_bytes()
+
+        def failing_convert(*args, **kwargs):
+            raise RuntimeError("conversion failed")
+
+        monkeypatch.setattr(train, "convert_sklearn", failing_convert)
+        new_model = clone(model).set_params(max_iter=5).fit(X, model.predict(X))
+        with pytest.raises(RuntimeError):
+            trainer.save_model(new_model, model_path)
+
+        assert (
+            model_path.read_bytes(),
+            model_path.with_suffix(".onnx").read_bytes(),
+        ) == saved
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])